@@ -0,0 +1,32 @@
+"""Launch one headless Chromium shared by every backend worker.
+
+Start this once per host, then run the workers with
+CHROME_CDP_URL=http://127.0.0.1:9222 so each attaches over CDP
+instead of launching its own browser.
+"""
+import os
+import subprocess
+
+from playwright.sync_api import sync_playwright
+
+from chromium_flags import CHROMIUM_ARGS
+
+CDP_PORT = os.environ.get('CHROME_CDP_PORT', '9222')
+
+
+def main():
+    with sync_playwright() as p:
+        executable = p.chromium.executable_path
+    
+    subprocess.run([
+        executable,
+        '--headless=new',
+        '--remote-debugging-address=127.0.0.1',
+        f'--remote-debugging-port={CDP_PORT}',
+        *CHROMIUM_ARGS,
+        'about:blank'
+    ], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+"""Chromium launch flags shared by the backend and chrome_sidecar.py."""
+
+CHROMIUM_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process'
+]
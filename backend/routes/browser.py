@@ -1,75 +1,243 @@
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import asyncio
-import base64
+import os
+import pybase64
+import time
 import uuid
 import logging
+import orjson
+import xxhash
 from datetime import datetime
-from playwright.async_api import async_playwright, Browser, Page, BrowserContext
+from playwright.async_api import async_playwright, Browser, Page, BrowserContext, CDPSession
+from chromium_flags import CHROMIUM_ARGS
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/browser", tags=["browser"])
 
 # Browser session management
+# Number of fresh contexts kept warm for new sessions
+CONTEXT_POOL_SIZE = 4
+# Sessions are spread over this many dicts; must be a power of two
+SESSION_SHARDS = 16
+# Shared Chromium to attach to instead of launching one per worker
+CHROME_CDP_URL = os.environ.get('CHROME_CDP_URL')
+# Idle seconds before a session is reaped, and the cap on live sessions
+SESSION_TTL = float(os.environ.get('BROWSER_SESSION_TTL', '600'))
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', '50'))
+REAPER_INTERVAL = 30
+# Navigation entries kept per session
+MAX_HISTORY = 100
+
+class SessionLimitError(Exception):
+    """Raised when MAX_SESSIONS are live and none of them can be evicted"""
+
 class BrowserSessionManager:
     def __init__(self):
-        self.sessions: Dict[str, dict] = {}
+        self._shards: List[Dict[str, dict]] = [{} for _ in range(SESSION_SHARDS)]
         self.playwright = None
         self.browser: Optional[Browser] = None
         self._lock = asyncio.Lock()
+        self._context_pool: asyncio.Queue = asyncio.Queue(maxsize=CONTEXT_POOL_SIZE)
+        self._refill_task: Optional[asyncio.Task] = None
+        # Slots claimed by create_session calls still building their page
+        self._reserved = 0
+        self._reaper_task: Optional[asyncio.Task] = None
     
     async def initialize(self):
-        if self.playwright is None:
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process'
-                ]
-            )
+        # Serialized so concurrent first sessions share one browser and pool
+        async with self._lock:
+            if self.playwright is not None:
+                return
+            playwright = await async_playwright().start()
+            if CHROME_CDP_URL:
+                self.browser = await playwright.chromium.connect_over_cdp(CHROME_CDP_URL)
+                logger.info(f"Connected to shared Chromium at {CHROME_CDP_URL}")
+            else:
+                self.browser = await playwright.chromium.launch(
+                    headless=True,
+                    args=CHROMIUM_ARGS
+                )
+            for _ in range(CONTEXT_POOL_SIZE):
+                self._context_pool.put_nowait(await self._new_context())
+            self._reaper_task = asyncio.create_task(self._reaper())
+            # Only mark as initialized once the pool is ready
+            self.playwright = playwright
             logger.info("Playwright browser initialized")
     
+    async def _new_context(self) -> BrowserContext:
+        return await self.browser.new_context(
+            viewport={'width': 1280, 'height': 720},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+    
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill_pool())
+    
+    async def _refill_pool(self):
+        """Top the warm context pool back up to CONTEXT_POOL_SIZE"""
+        while not self._context_pool.full():
+            try:
+                context = await self._new_context()
+            except Exception as e:
+                logger.error(f"Failed to refill context pool: {e}")
+                return
+            self._context_pool.put_nowait(context)
+    
     async def create_session(self) -> str:
         await self.initialize()
         
+        # Check and reserve a slot with no await in between so concurrent
+        # creates cannot overshoot MAX_SESSIONS
+        evicted = None
+        if self._session_count() + self._reserved >= MAX_SESSIONS:
+            evicted = self._pop_lru()
+            if evicted is None:
+                raise SessionLimitError(f"Session limit of {MAX_SESSIONS} reached")
+        self._reserved += 1
+        try:
+            if evicted is not None:
+                logger.info(f"Evicting least recently used session: {evicted[0]}")
+                await self._close_popped(*evicted)
+            return await self._open_session()
+        finally:
+            self._reserved -= 1
+    
+    async def _open_session(self) -> str:
         session_id = str(uuid.uuid4())
-        context = await self.browser.new_context(
-            viewport={'width': 1280, 'height': 720},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        )
+        # Contexts are never reused across sessions, so take a fresh one
+        # and replace it in the background
+        try:
+            context = self._context_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            context = await self._new_context()
+        self._schedule_refill()
         page = await context.new_page()
         
-        self.sessions[session_id] = {
+        session = {
             'context': context,
             'page': page,
-            'created_at': datetime.utcnow(),
+            'url': page.url,
+            'title': '',
+            'title_task': None,
+            'cdp': None,
+            'last_used_mono': time.monotonic(),
+            'websockets': 0,
             'history': [],
             'history_index': -1
         }
+        self._track_page_info(session)
+        self._shard(session_id)[session_id] = session
         
         logger.info(f"Created browser session: {session_id}")
         return session_id
     
+    def _track_page_info(self, session: dict):
+        """Keep session['url'] and session['title'] current from page events"""
+        page: Page = session['page']
+        
+        async def refresh_title():
+            try:
+                session['title'] = await page.title()
+            except Exception:
+                pass
+        
+        def schedule_title_refresh():
+            # Keep a reference so the task isn't collected, and drop any older
+            # refresh so a stale title can't land after a newer one
+            pending = session['title_task']
+            if pending is not None and not pending.done():
+                pending.cancel()
+            session['title_task'] = asyncio.create_task(refresh_title())
+        
+        def on_frame_navigated(frame):
+            if frame.parent_frame is None:
+                session['url'] = frame.url
+                schedule_title_refresh()
+        
+        page.on('framenavigated', on_frame_navigated)
+        page.on('load', lambda _: schedule_title_refresh())
+    
+    async def get_cdp(self, session: dict) -> CDPSession:
+        """Return the session's CDP session for one-off commands, attaching on first use"""
+        if session.get('cdp') is None:
+            session['cdp'] = await session['context'].new_cdp_session(session['page'])
+        return session['cdp']
+    
+    def _shard(self, session_id: str) -> Dict[str, dict]:
+        return self._shards[hash(session_id) & (SESSION_SHARDS - 1)]
+    
+    def _session_count(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+    
+    def _idle_sessions(self):
+        """Yield (session_id, session) for sessions without a live websocket"""
+        for shard in self._shards:
+            for session_id, session in list(shard.items()):
+                if session['websockets'] == 0:
+                    yield session_id, session
+    
+    def _pop_lru(self) -> Optional[tuple]:
+        """Remove and return the least recently used idle (session_id, session)"""
+        idle = list(self._idle_sessions())
+        if not idle:
+            return None
+        session_id, session = min(idle, key=lambda item: item[1]['last_used_mono'])
+        del self._shard(session_id)[session_id]
+        return session_id, session
+    
+    async def _reaper(self):
+        """Periodically close sessions that have been idle longer than SESSION_TTL"""
+        while True:
+            await asyncio.sleep(REAPER_INTERVAL)
+            now = time.monotonic()
+            expired = [
+                session_id for session_id, session in self._idle_sessions()
+                if now - session['last_used_mono'] > SESSION_TTL
+            ]
+            for session_id in expired:
+                try:
+                    logger.info(f"Reaping idle session: {session_id}")
+                    await self.close_session(session_id)
+                except Exception as e:
+                    logger.error(f"Failed to reap session {session_id}: {e}")
+    
     async def get_session(self, session_id: str) -> Optional[dict]:
-        return self.sessions.get(session_id)
+        session = self._shard(session_id).get(session_id)
+        if session is not None:
+            session['last_used_mono'] = time.monotonic()
+        return session
     
     async def close_session(self, session_id: str):
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
+        session = self._shard(session_id).pop(session_id, None)
+        if session is not None:
+            await self._close_popped(session_id, session)
+    
+    async def _close_popped(self, session_id: str, session: dict):
+        if session['title_task'] is not None:
+            session['title_task'].cancel()
+        try:
             await session['context'].close()
-            del self.sessions[session_id]
-            logger.info(f"Closed browser session: {session_id}")
+        except Exception as e:
+            logger.error(f"Failed to close session {session_id}: {e}")
+            return
+        logger.info(f"Closed browser session: {session_id}")
     
     async def cleanup(self):
-        for session_id in list(self.sessions.keys()):
-            await self.close_session(session_id)
+        if self._reaper_task:
+            self._reaper_task.cancel()
+        if self._refill_task:
+            self._refill_task.cancel()
+        await asyncio.gather(*(
+            self.close_session(session_id)
+            for shard in self._shards
+            for session_id in list(shard)
+        ), return_exceptions=True)
+        while not self._context_pool.empty():
+            await self._context_pool.get_nowait().close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -77,6 +245,26 @@ class BrowserSessionManager:
 
 session_manager = BrowserSessionManager()
 
+JPEG_DATA_URI_PREFIX = 'data:image/jpeg;base64,'
+
+# Modifier flags in the order Playwright expects them in a key combo
+_MOD_ORDER = (('ctrl', 'Control'), ('alt', 'Alt'), ('shift', 'Shift'), ('meta', 'Meta'))
+
+def key_combo(key: str, modifiers: Optional[Dict[str, bool]] = None) -> str:
+    """Build a Playwright key string such as 'Control+Shift+a'"""
+    if not modifiers:
+        return key
+    return '+'.join([pw_key for mod, pw_key in _MOD_ORDER if modifiers.get(mod)] + [key])
+
+def push_history(session: dict, url: str):
+    """Record a navigation, dropping forward entries and capping at MAX_HISTORY"""
+    history = session['history']
+    del history[session['history_index'] + 1:]
+    history.append(url)
+    if len(history) > MAX_HISTORY:
+        del history[0]
+    session['history_index'] = len(history) - 1
+
 # Request/Response models
 class CreateSessionResponse(BaseModel):
     session_id: str
@@ -119,11 +307,12 @@ async def create_session():
     """Create a new browser session"""
     try:
         session_id = await session_manager.create_session()
-        session = await session_manager.get_session(session_id)
         return CreateSessionResponse(
             session_id=session_id,
-            created_at=session['created_at']
+            created_at=datetime.utcnow()
         )
+    except SessionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to create session: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -145,14 +334,13 @@ async def get_session_status(session_id: str):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    page: Page = session['page']
     history = session['history']
     history_index = session['history_index']
     
     return SessionStatusResponse(
         session_id=session_id,
-        current_url=page.url,
-        title=await page.title(),
+        current_url=session['url'],
+        title=session['title'],
         can_go_back=history_index > 0,
         can_go_forward=history_index < len(history) - 1
     )
@@ -169,10 +357,7 @@ async def navigate(session_id: str, request: NavigateRequest):
     try:
         await page.goto(request.url, wait_until='domcontentloaded', timeout=30000)
         
-        # Update history
-        session['history'] = session['history'][:session['history_index'] + 1]
-        session['history'].append(request.url)
-        session['history_index'] = len(session['history']) - 1
+        push_history(session, request.url)
         
         return {
             "status": "navigated",
@@ -231,16 +416,20 @@ async def get_screenshot(session_id: str):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    page: Page = session['page']
-    
     try:
-        screenshot_bytes = await page.screenshot(type='jpeg', quality=60)
-        screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+        # Capture straight from the view; CDP already returns base64
+        cdp = await session_manager.get_cdp(session)
+        frame = await cdp.send('Page.captureScreenshot', {
+            'format': 'jpeg',
+            'quality': 60,
+            'fromSurface': False,
+            'captureBeyondViewport': False
+        })
         
         return ScreenshotResponse(
-            screenshot=f"data:image/jpeg;base64,{screenshot_base64}",
-            url=page.url,
-            title=await page.title()
+            screenshot=JPEG_DATA_URI_PREFIX + frame['data'],
+            url=session['url'],
+            title=session['title']
         )
     except Exception as e:
         logger.error(f"Screenshot failed: {e}")
@@ -276,21 +465,7 @@ async def keypress(session_id: str, request: KeyPressRequest):
         raise HTTPException(status_code=404, detail="Session not found")
     
     page: Page = session['page']
-    
-    modifiers = request.modifiers or {}
-    keys = []
-    
-    if modifiers.get('ctrl'):
-        keys.append('Control')
-    if modifiers.get('alt'):
-        keys.append('Alt')
-    if modifiers.get('shift'):
-        keys.append('Shift')
-    if modifiers.get('meta'):
-        keys.append('Meta')
-    
-    keys.append(request.key)
-    await page.keyboard.press('+'.join(keys))
+    await page.keyboard.press(key_combo(request.key, request.modifiers))
     
     return {"status": "pressed"}
 
@@ -306,8 +481,59 @@ async def scroll(session_id: str, request: ScrollRequest):
     return {"status": "scrolled"}
 
 # WebSocket for real-time streaming
+# Frames the client may be behind on before the screencast is paused
+MAX_FRAMES_IN_FLIGHT = 2
+# Seconds a frame send may block before it is given up on
+FRAME_SEND_TIMEOUT = 0.1
+# Seconds to hold Chrome's frame ack for a lagging client before moving on
+ACK_HOLD_TIMEOUT = 1.0
+# Resend an unchanged frame after this many skips in case the client missed it
+KEYFRAME_INTERVAL = 30
+# Screencast encoding; Chrome downscales and JPEG-encodes in one pass
+STREAM_JPEG_QUALITY = int(os.environ.get('STREAM_JPEG_QUALITY', '40'))
+STREAM_MAX_WIDTH = int(os.environ.get('STREAM_MAX_WIDTH', '1280'))
+STREAM_MAX_HEIGHT = int(os.environ.get('STREAM_MAX_HEIGHT', '720'))
+
+async def send_event(websocket: WebSocket, payload: dict):
+    # Text frame so clients can tell JSON apart from binary JPEG frames
+    await websocket.send_text(orjson.dumps(payload).decode())
+
+async def receive_event(websocket: WebSocket) -> dict:
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000), message.get('reason'))
+    # Accept events sent as either text or binary frames
+    raw = message.get('text')
+    return orjson.loads(raw if raw is not None else message['bytes'])
+
+async def screencast_frames(cdp: CDPSession):
+    """Yield CDP screencast frames until the generator is closed"""
+    frames: asyncio.Queue = asyncio.Queue()
+    
+    def on_frame(frame: dict):
+        frames.put_nowait(frame)
+    
+    # Let Chrome push frames only when the page repaints instead of polling
+    cdp.on('Page.screencastFrame', on_frame)
+    try:
+        await cdp.send('Page.startScreencast', {
+            'format': 'jpeg',
+            'quality': STREAM_JPEG_QUALITY,
+            'maxWidth': STREAM_MAX_WIDTH,
+            'maxHeight': STREAM_MAX_HEIGHT,
+            'everyNthFrame': 1
+        })
+        while True:
+            yield await frames.get()
+    finally:
+        cdp.remove_listener('Page.screencastFrame', on_frame)
+        try:
+            await cdp.send('Page.stopScreencast')
+        except Exception:
+            pass
+
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
+async def websocket_endpoint(websocket: WebSocket, session_id: str, encoding: str = "binary"):
     await websocket.accept()
     
     session = await session_manager.get_session(session_id)
@@ -315,85 +541,208 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         await websocket.close(code=4004, reason="Session not found")
         return
     
+    # Sessions with a live websocket are never reaped or evicted; count this
+    # one before the first await so it can't be closed while connecting
+    session['websockets'] += 1
+    
     page: Page = session['page']
-    streaming = True
+    cdp: Optional[CDPSession] = None
+    stream_task: Optional[asyncio.Task] = None
+    input_task: Optional[asyncio.Task] = None
+    input_events: asyncio.Queue = asyncio.Queue()
+    # Legacy clients can pass ?encoding=base64 to keep receiving data URIs
+    binary_frames = encoding != "base64"
+    seq = 0
+    last_hash: Optional[int] = None
+    skipped = 0
+    acked_seq: Optional[int] = None
+    # A slow frame send left to finish in the background
+    pending_send: Optional[asyncio.Task] = None
+    # Set by client acks once the client is no longer behind
+    caught_up = asyncio.Event()
+    
+    def client_is_behind() -> bool:
+        # Flow control only kicks in once the client has started acking
+        return acked_seq is not None and seq - acked_seq > MAX_FRAMES_IN_FLIGHT
+    
+    async def send_frame(frame: dict, seq: int):
+        if binary_frames:
+            # JSON header followed by the raw JPEG as a binary frame
+            await send_event(websocket, {
+                "type": "screenshot",
+                "url": session['url'],
+                "title": session['title'],
+                "seq": seq
+            })
+            # pybase64 has no decode-into-buffer API to reuse a buffer here
+            await websocket.send_bytes(pybase64.b64decode(frame['data']))
+        else:
+            # Screencast frames are already base64 encoded
+            await send_event(websocket, {
+                "type": "screenshot",
+                "data": JPEG_DATA_URI_PREFIX + frame['data'],
+                "url": session['url'],
+                "title": session['title'],
+                "seq": seq
+            })
+    
+    async def finish_pending_send():
+        nonlocal pending_send, last_hash
+        if pending_send is None:
+            return
+        try:
+            await pending_send
+        except Exception as e:
+            # The client may not have the image; don't dedupe against it
+            last_hash = None
+            logger.error(f"Streaming error: {e}")
+        pending_send = None
+    
+    async def stream_frames():
+        nonlocal seq, last_hash, skipped, pending_send
+        frames = screencast_frames(cdp)
+        try:
+            async for frame in frames:
+                try:
+                    # Repaints often produce identical pixels; don't resend those
+                    frame_hash = xxhash.xxh3_64_intdigest(frame['data'])
+                    if frame_hash == last_hash and skipped < KEYFRAME_INTERVAL:
+                        skipped += 1
+                        await cdp.send('Page.screencastFrameAck', {'sessionId': frame['sessionId']})
+                        continue
+                    
+                    # Never interleave one frame's header and image with another's
+                    await finish_pending_send()
+                    
+                    seq += 1
+                    last_hash = frame_hash
+                    skipped = 0
+                    send = asyncio.create_task(send_frame(frame, seq))
+                    try:
+                        await asyncio.wait_for(asyncio.shield(send), timeout=FRAME_SEND_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        # Don't cut a frame in half on a slow socket: let it finish
+                        # in the background and move on to acking Chrome
+                        logger.debug(f"Frame {seq} send is slow: {session_id}")
+                        pending_send = send
+                    except Exception as e:
+                        # Not delivered: don't count it as in flight or dedupe
+                        # against it, but still ack Chrome below
+                        seq -= 1
+                        last_hash = None
+                        logger.error(f"Streaming error: {e}")
+                    
+                    # Chrome only pushes the next frame once this one is acked, so
+                    # holding the ack stops encoding until the client drains
+                    if client_is_behind():
+                        caught_up.clear()
+                        try:
+                            await asyncio.wait_for(caught_up.wait(), timeout=ACK_HOLD_TIMEOUT)
+                        except asyncio.TimeoutError:
+                            logger.debug(f"Client acks stalled, resuming screencast: {session_id}")
+                    await cdp.send('Page.screencastFrameAck', {'sessionId': frame['sessionId']})
+                except Exception as e:
+                    logger.error(f"Streaming error: {e}")
+        except Exception as e:
+            logger.error(f"Screencast failed: {e}")
+        finally:
+            if pending_send is not None:
+                pending_send.cancel()
+            # Stops the screencast before the task finishes cancelling
+            await frames.aclose()
     
-    async def stream_screenshots():
-        nonlocal streaming
-        while streaming:
+    async def handle_input():
+        """Apply queued input events to the page in the order they arrived"""
+        while True:
+            data = await input_events.get()
+            event_type = data.get('type')
             try:
-                screenshot_bytes = await page.screenshot(type='jpeg', quality=40)
-                screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+                if event_type == 'navigate':
+                    url = data.get('url')
+                    if url:
+                        try:
+                            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+                            push_history(session, url)
+                        except Exception as e:
+                            await send_event(websocket, {"type": "error", "message": str(e)})
+                
+                elif event_type == 'click':
+                    x, y = data.get('x', 0), data.get('y', 0)
+                    button = data.get('button', 'left')
+                    await page.mouse.click(x, y, button=button)
+                
+                elif event_type == 'type':
+                    text = data.get('text', '')
+                    await page.keyboard.type(text)
+                
+                elif event_type == 'keypress':
+                    key = data.get('key', '')
+                    await page.keyboard.press(key_combo(key, data.get('modifiers')))
+                
+                elif event_type == 'scroll':
+                    delta_x = data.get('deltaX', 0)
+                    delta_y = data.get('deltaY', 0)
+                    await page.mouse.wheel(delta_x, delta_y)
+                
+                elif event_type == 'back':
+                    if session['history_index'] > 0:
+                        session['history_index'] -= 1
+                        await page.go_back()
                 
-                await websocket.send_json({
-                    "type": "screenshot",
-                    "data": f"data:image/jpeg;base64,{screenshot_base64}",
-                    "url": page.url,
-                    "title": await page.title()
-                })
+                elif event_type == 'forward':
+                    if session['history_index'] < len(session['history']) - 1:
+                        session['history_index'] += 1
+                        await page.go_forward()
                 
-                await asyncio.sleep(0.1)  # 10 FPS
+                elif event_type == 'refresh':
+                    await page.reload()
             except Exception as e:
-                logger.error(f"Streaming error: {e}")
-                break
-    
-    stream_task = asyncio.create_task(stream_screenshots())
+                logger.error(f"Input event {event_type} failed: {e}")
     
     try:
+        # Each websocket gets its own CDP session so viewers start, stop and
+        # ack their screencasts independently
+        cdp = await session['context'].new_cdp_session(page)
+        stream_task = asyncio.create_task(stream_frames())
+        input_task = asyncio.create_task(handle_input())
+        
+        # Acks are handled here as they arrive; everything else is queued so a
+        # slow navigation can't hold up flow control
         while True:
-            data = await websocket.receive_json()
-            event_type = data.get('type')
-            
-            if event_type == 'navigate':
-                url = data.get('url')
-                if url:
-                    try:
-                        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-                        session['history'].append(url)
-                        session['history_index'] = len(session['history']) - 1
-                    except Exception as e:
-                        await websocket.send_json({"type": "error", "message": str(e)})
-            
-            elif event_type == 'click':
-                x, y = data.get('x', 0), data.get('y', 0)
-                button = data.get('button', 'left')
-                await page.mouse.click(x, y, button=button)
-            
-            elif event_type == 'type':
-                text = data.get('text', '')
-                await page.keyboard.type(text)
-            
-            elif event_type == 'keypress':
-                key = data.get('key', '')
-                await page.keyboard.press(key)
-            
-            elif event_type == 'scroll':
-                delta_x = data.get('deltaX', 0)
-                delta_y = data.get('deltaY', 0)
-                await page.mouse.wheel(delta_x, delta_y)
-            
-            elif event_type == 'back':
-                if session['history_index'] > 0:
-                    session['history_index'] -= 1
-                    await page.go_back()
-            
-            elif event_type == 'forward':
-                if session['history_index'] < len(session['history']) - 1:
-                    session['history_index'] += 1
-                    await page.go_forward()
-            
-            elif event_type == 'refresh':
-                await page.reload()
+            data = await receive_event(websocket)
+            if data.get('type') == 'ack':
+                ack_seq = data.get('seq')
+                if isinstance(ack_seq, int):
+                    acked_seq = max(acked_seq or 0, ack_seq)
+                    if not client_is_behind():
+                        caught_up.set()
+            else:
+                input_events.put_nowait(data)
                 
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected: {session_id}")
-    finally:
-        streaming = False
-        stream_task.cancel()
+    except Exception as e:
+        logger.error(f"WebSocket error: {e}")
         try:
-            await stream_task
-        except asyncio.CancelledError:
+            await websocket.close(code=1011)
+        except Exception:
             pass
+    finally:
+        session['websockets'] -= 1
+        session['last_used_mono'] = time.monotonic()
+        if input_task is not None:
+            input_task.cancel()
+        if stream_task is not None:
+            stream_task.cancel()
+            try:
+                await stream_task
+            except asyncio.CancelledError:
+                pass
+        if cdp is not None:
+            try:
+                await cdp.detach()
+            except Exception:
+                pass
 
 # Cleanup on shutdown
 async def cleanup_sessions():
@@ -3,7 +3,8 @@ from pydantic import BaseModel
 from typing import List, Optional
 import os
 import logging
-import json
+import orjson
+from async_lru import alru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +17,11 @@ class SuggestionsResponse(BaseModel):
     suggestions: List[str]
     query: str
 
+# alru_cache stores the pending call before it completes, so concurrent
+# identical queries await one shared LLM request rather than each calling out
+@alru_cache(maxsize=4096, ttl=60)
 async def get_ai_suggestions(query: str, limit: int = 5) -> List[str]:
-    """Get AI suggestions using emergentintegrations"""
+    """Get AI suggestions using emergentintegrations (cached per query for 60s)"""
     from emergentintegrations.llm.chat import chat, Message, LLMConfig
     
     try:
@@ -42,16 +46,14 @@ async def get_ai_suggestions(query: str, limit: int = 5) -> List[str]:
         response = await chat(config=config, messages=messages)
         content = response.message.strip()
         
-        # Parse JSON array from response
-        if content.startswith('['):
-            suggestions = json.loads(content)
+        # Parse JSON array from response, skipping any text around it
+        raw = content.encode()
+        start = raw.find(b'[')
+        end = raw.rfind(b']') + 1
+        if start >= 0 and end > start:
+            suggestions = orjson.loads(raw[start:end])
         else:
-            start = content.find('[')
-            end = content.rfind(']') + 1
-            if start >= 0 and end > start:
-                suggestions = json.loads(content[start:end])
-            else:
-                suggestions = [query]
+            suggestions = [query]
         
         return suggestions[:limit]
         
@@ -66,7 +68,8 @@ async def get_search_suggestions(q: str, limit: int = 5):
         return SuggestionsResponse(suggestions=[], query=q)
     
     try:
-        suggestions = await get_ai_suggestions(q, limit)
+        # Normalize so casing/whitespace variants share a cache entry
+        suggestions = await get_ai_suggestions(q.strip().lower(), limit)
         return SuggestionsResponse(
             suggestions=suggestions,
             query=q
@@ -86,3 +89,13 @@ async def get_search_suggestions(q: str, limit: int = 5):
             suggestions=fallback[:limit],
             query=q
         )
+
+@router.get("/suggestions/stats")
+async def get_suggestions_stats():
+    """Report suggestion cache usage"""
+    info = get_ai_suggestions.cache_info()
+    return {
+        "suggestions_cache_size": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses
+    }
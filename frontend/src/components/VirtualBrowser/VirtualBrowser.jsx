@@ -33,6 +33,8 @@ const VirtualBrowser = ({ defaultExpanded = true, onClose }) => {
   
   // WebSocket state
   const wsRef = useRef(null);
+  const frameUrlRef = useRef(null);
+  const frameSeqRef = useRef(0);
   const [wsConnected, setWsConnected] = useState(false);
   
   // Extensions state
@@ -82,11 +84,30 @@ const VirtualBrowser = ({ defaultExpanded = true, onClose }) => {
     };
 
     ws.onmessage = (event) => {
+      // Binary frames carry the raw JPEG announced by the preceding header
+      if (event.data instanceof Blob) {
+        const frameUrl = URL.createObjectURL(event.data);
+        if (frameUrlRef.current) {
+          URL.revokeObjectURL(frameUrlRef.current);
+        }
+        frameUrlRef.current = frameUrl;
+        setScreenshot(frameUrl);
+        setIsLoading(false);
+        // Ack so the server keeps streaming at the rate we can consume
+        ws.send(JSON.stringify({ type: 'ack', seq: frameSeqRef.current }));
+        return;
+      }
+
       try {
         const data = JSON.parse(event.data);
         
         if (data.type === 'screenshot') {
-          setScreenshot(data.data);
+          frameSeqRef.current = data.seq;
+          // Legacy base64 mode inlines the image as a data URI
+          if (data.data) {
+            setScreenshot(data.data);
+            ws.send(JSON.stringify({ type: 'ack', seq: data.seq }));
+          }
           setIsLoading(false);
           
           // Update tab info
@@ -110,6 +131,10 @@ const VirtualBrowser = ({ defaultExpanded = true, onClose }) => {
       console.log('WebSocket disconnected');
       setWsConnected(false);
       wsRef.current = null;
+      if (frameUrlRef.current) {
+        URL.revokeObjectURL(frameUrlRef.current);
+        frameUrlRef.current = null;
+      }
     };
 
     ws.onerror = (err) => {
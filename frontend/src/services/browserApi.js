@@ -134,9 +134,11 @@ export const browserApi = {
   },
 
   // Create WebSocket connection
-  createWebSocket: (sessionId) => {
+  // Screenshots arrive as a JSON header followed by a binary JPEG frame;
+  // pass encoding = 'base64' to receive inline data URIs instead.
+  createWebSocket: (sessionId, encoding = 'binary') => {
     const wsBaseUrl = getWsUrl();
-    return new WebSocket(`${wsBaseUrl}/api/browser/ws/${sessionId}`);
+    return new WebSocket(`${wsBaseUrl}/api/browser/ws/${sessionId}?encoding=${encoding}`);
   },
 };
 